@@ -36,6 +36,7 @@ from views import overview, manage_people, manage_units, manage_boards, statisti
 from database import init_db
 from auth import init_auth, logout
 from views.custom_logging import log_action, current_time
+from views.cache_manager import refresh_cache
 
 # Konfigurera Streamlit för optimal användarupplevelse
 st.set_page_config(
@@ -131,10 +132,7 @@ def main():
         with col2:
             if st.button("↻ Uppdatera data", help="Uppdatera all data från databasen"):
                 # Force refresh of cached data
-                if 'cached_data' in st.session_state:
-                    del st.session_state.cached_data
-                if 'cached_indexes' in st.session_state:
-                    del st.session_state.cached_indexes
+                refresh_cache(db)
                 st.session_state.needs_recalculation = True
                 st.rerun()
 
@@ -21,22 +21,104 @@ Tekniska detaljer:
 """
 
 import streamlit as st
+import hashlib
+import sys
+import uuid
 from collections import defaultdict
 
 
+BASE_COLLECTIONS = ('forvaltningar', 'avdelningar', 'enheter', 'arbetsplatser', 'personer', 'boards')
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_collection(_db, collection_name):
+    """
+    Hämtar alla dokument i en samling.
+
+    Resultatet delas mellan sessioner i upp till fem minuter, så att nya
+    sessioner och omladdningar slipper gå till databasen varje gång.
+    Streamlit lämnar ut en egen kopia vid varje anrop, så dokumenten kan
+    förberedas och ändras i sessionens cache utan att påverka andra.
+
+    Returnerar dokumenten tillsammans med en version som räknas fram ur
+    innehållet, så att samma data alltid får samma version.
+    """
+    docs = list(_db[collection_name].find())
+    version = hashlib.sha1(repr(docs).encode('utf-8')).hexdigest()
+    return docs, version
+
+
+def clear_collection_cache():
+    """
+    Tömmer den delade cachen med inlästa samlingar.
+
+    Ska anropas efter varje skrivning till databasen, så att nästa
+    inläsning i alla sessioner hämtar aktuell data.
+    """
+    _load_collection.clear()
+
+
 def load_base_data(db):
     """
     Hämtar grundläggande data från databasen.
     Detta är första steget i cachningen där vi läser in all rådata.
+
+    Returnerar datan och en ordbok med versionen för varje samling.
     """
-    return {
-        'forvaltningar': list(db.forvaltningar.find()),
-        'avdelningar': list(db.avdelningar.find()),
-        'enheter': list(db.enheter.find()),
-        'arbetsplatser': list(db.arbetsplatser.find()),
-        'personer': list(db.personer.find()),
-        'boards': list(db.boards.find())
-    }
+    data = {}
+    versions = {}
+    for name in BASE_COLLECTIONS:
+        data[name], versions[name] = _load_collection(db, name)
+    return data, versions
+
+
+def prepare_document(collection_name, doc):
+    """
+    Förbereder ett dokument för cachen med förberäknade fält.
+    
+    Statistiken jämför ID:n som strängar i nästlade loopar, och att göra
+    om ett ObjectId till sträng är inte gratis. Därför görs det en gång här:
+    - '_sid' på förvaltningar, avdelningar och enheter
+    - '_forv_sid', '_avd_sid' och '_enhet_sid' på personer
+    
+    Arbetsplatsnamn används som nycklar på många ställen och internaliseras
+    så att uppslagningar kan jämföra pekare istället för hela strängar.
+    """
+    if collection_name in ('forvaltningar', 'avdelningar', 'enheter'):
+        doc['_sid'] = str(doc['_id'])
+    elif collection_name == 'arbetsplatser':
+        if isinstance(doc.get('namn'), str):
+            doc['namn'] = sys.intern(doc['namn'])
+    elif collection_name == 'personer':
+        doc['_forv_sid'] = str(doc.get('forvaltning_id'))
+        doc['_avd_sid'] = str(doc.get('avdelning_id'))
+        doc['_enhet_sid'] = str(doc.get('enhet_id'))
+        if doc.get('arbetsplats'):
+            doc['arbetsplats'] = [sys.intern(namn) if isinstance(namn, str) else namn
+                                  for namn in doc['arbetsplats']]
+
+
+def prepare_cached_data(data):
+    """
+    Förbereder alla dokument i nyinläst data, se prepare_document.
+    
+    Namnen på överliggande förvaltning och avdelning slås också upp via
+    ordböcker, så att avdelningar och enheter visar aktuella namn utan
+    att listorna behöver genomsökas per dokument.
+    """
+    for collection_name, docs in data.items():
+        for doc in docs:
+            prepare_document(collection_name, doc)
+
+    forv_names = {forv['_sid']: forv['namn'] for forv in data['forvaltningar']}
+    avd_names = {avd['_sid']: avd['namn'] for avd in data['avdelningar']}
+
+    for avd in data['avdelningar']:
+        avd['forvaltning_namn'] = forv_names.get(str(avd.get('forvaltning_id')), avd.get('forvaltning_namn', ''))
+
+    for enhet in data['enheter']:
+        enhet['forvaltning_namn'] = forv_names.get(str(enhet.get('forvaltning_id')), enhet.get('forvaltning_namn', ''))
+        enhet['avdelning_namn'] = avd_names.get(str(enhet.get('avdelning_id')), enhet.get('avdelning_namn', ''))
 
 
 def create_indexes(data):
@@ -49,6 +131,7 @@ def create_indexes(data):
     - Hitta arbetsplatser i en förvaltning
     - Hitta personer på en arbetsplats
     - Skilja på regionala och lokala arbetsplatser
+    - Lista arbetsplatser som saknar koordinater
     """
     indexes = {
         'avdelningar_by_forv': defaultdict(list),
@@ -58,6 +141,7 @@ def create_indexes(data):
         'personer_by_arbetsplats': defaultdict(list),
         'boards_by_forv': defaultdict(list),
         'regionala_arbetsplatser': [],
+        'arbetsplatser_utan_koordinater': [],
         'id_lookup': {
             'forvaltningar': {},
             'avdelningar': {},
@@ -86,6 +170,8 @@ def create_indexes(data):
         else:
             forv_id = ap['forvaltning_id']
             indexes['arbetsplatser_by_forv'][forv_id].append(ap)
+        if not ap.get('coordinates'):
+            indexes['arbetsplatser_utan_koordinater'].append(ap['namn'])
         indexes['id_lookup']['arbetsplatser'][ap['_id']] = ap
 
     # Indexera personer
@@ -117,13 +203,39 @@ def get_cached_data(db, force_refresh=False):
     - Uppdaterar cachen om data har ändrats
     - Tvingar uppdatering om force_refresh är True
     """
+    if force_refresh:
+        clear_collection_cache()
+
     if force_refresh or 'cached_data' not in st.session_state:
-        st.session_state.cached_data = load_base_data(db)
+        st.session_state.cached_data, st.session_state.cached_versions = load_base_data(db)
+        prepare_cached_data(st.session_state.cached_data)
         st.session_state.cached_indexes = create_indexes(st.session_state.cached_data)
 
     return st.session_state.cached_data, st.session_state.cached_indexes
 
 
+def bump_cache_version(collection_name):
+    """
+    Ger en samling i cachen en ny unik version.
+    
+    Används när sessionens kopia ändras direkt, utan att läsas om från
+    databasen, så att beräkningar som cachas på versionen räknas om.
+    """
+    st.session_state.setdefault('cached_versions', {})[collection_name] = uuid.uuid4().hex
+
+
+def get_cache_version(*collection_names):
+    """
+    Returnerar versionen för den data som ligger i cachen just nu.
+
+    Versionen används som nyckel för beräkningar som cachas med
+    st.cache_data. Den ändras bara när innehållet i de angivna samlingarna
+    ändras, eller i någon samling om inga namn anges.
+    """
+    versions = st.session_state.get('cached_versions', {})
+    return '-'.join(str(versions.get(name)) for name in (collection_names or BASE_COLLECTIONS))
+
+
 def refresh_cache(db):
     """
     Tvingar fram en uppdatering av all cachad data.
@@ -144,22 +256,34 @@ def update_cache_after_change(db, collection_name, operation, data=None):
     - Vid små ändringar uppdateras bara berörda delar
     - Säkerställer att cachen alltid är korrekt
     """
+    # Andra sessioner ska läsa in ändringen från databasen
+    clear_collection_cache()
+
     # För större ändringar, uppdatera hela cachen
     if operation in ['delete', 'update'] or collection_name in ['forvaltningar', 'avdelningar']:
         refresh_cache(db)
         return
 
+    # Utan det nya dokumentet går det inte att uppdatera cachen på plats
+    if operation == 'create' and not data:
+        refresh_cache(db)
+        return
+
     # För enkla tillägg, uppdatera bara relevant data
     if operation == 'create' and data:
         if collection_name not in st.session_state.cached_data:
             refresh_cache(db)
             return
 
+        prepare_document(collection_name, data)
         st.session_state.cached_data[collection_name].append(data)
+        bump_cache_version(collection_name)
         # Uppdatera relevanta index
         if collection_name == 'personer':
             forv_id = data['forvaltning_id']
             st.session_state.cached_indexes['personer_by_forv'][forv_id].append(data)
             if data.get('arbetsplats'):
                 for arbetsplats in data['arbetsplats']:
-                    st.session_state.cached_indexes['personer_by_arbetsplats'][arbetsplats].append(data) 
\ No newline at end of file
+                    st.session_state.cached_indexes['personer_by_arbetsplats'][arbetsplats].append(data)
+        elif collection_name == 'arbetsplatser' and not data.get('coordinates'):
+            st.session_state.cached_indexes['arbetsplatser_utan_koordinater'].append(data['namn']) 
\ No newline at end of file
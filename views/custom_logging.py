@@ -238,14 +238,9 @@ def get_logs_by_category():
         for group in logs_collection.aggregate(pipeline):
             logs_by_category[group["_id"]] = group["logs"]
 
-        st.write(f"Totalt {len(logs_by_category)} kategorier grupperades.")
-
         success = f"Hämtar loggar!"
         os.write(1, success.encode())
 
-        for action, logs in logs_by_category.items():
-            st.write(f"Kategori: {category} - Antal loggar: {len(logs)}")
-
         return logs_by_category
 
     except Exception as e:
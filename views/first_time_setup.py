@@ -110,6 +110,7 @@ def show_first_time_setup(db):
                                 'created_at': datetime.now()
                             })
                             log_action("create", f"Skapade regional arbetsplats: {arb_namn}", "setup")
+                    update_cache_after_change(db, 'arbetsplatser', 'create')
                     
                     st.session_state.step2_done = True
                     st.success("Regionala arbetsplatser skapade!")
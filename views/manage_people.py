@@ -401,6 +401,7 @@ def show(db):
                                         
                                         if result.modified_count > 0 and changes:
                                             log_action("update", f"Uppdaterade person: {person['namn']} - Ändrade {', '.join(changes)}", "person")
+                                            update_cache_after_change(db, 'personer', 'update')
                                             st.success("Person uppdaterad!")
                                             st.rerun()
                                         else:
@@ -411,6 +412,7 @@ def show(db):
                                         log_action("delete", f"Tog bort person: {person['namn']}", "person")
                                         result = db.personer.delete_one({"_id": person["_id"]})
                                         if result.deleted_count > 0:
+                                            update_cache_after_change(db, 'personer', 'delete')
                                             st.success(f"{person['namn']} borttagen!")
                                             st.rerun()
                                         else:
@@ -20,9 +20,10 @@ Tekniska detaljer:
 """
 
 import streamlit as st
+from collections import defaultdict
 from views.custom_logging import log_action, current_time
 from pymongo import UpdateOne
-from views.cache_manager import get_cached_data, update_cache_after_change
+from views.cache_manager import get_cached_data, update_cache_after_change, clear_collection_cache
 from bson.objectid import ObjectId
 
 
@@ -64,27 +65,31 @@ def calculate_member_counts(db):
     avdelning_updates = []
     forvaltning_updates = []
 
+    # Summera medlemmar per enhet i en genomgång av arbetsplatserna
+    medlemmar_by_enhet = defaultdict(int)
+    for arbetsplats in arbetsplatser:
+        if not arbetsplats.get("alla_forvaltningar"):
+            # Hantera specifika arbetsplatser
+            medlemmar_per_enhet = arbetsplats.get("medlemmar_per_enhet", {})
+            if isinstance(medlemmar_per_enhet, dict):
+                for enhet_id, antal in medlemmar_per_enhet.items():
+                    medlemmar_by_enhet[enhet_id] += antal
+        else:
+            # Hantera regionala arbetsplatser
+            medlemmar_per_forvaltning = arbetsplats.get("medlemmar_per_forvaltning", {})
+            if isinstance(medlemmar_per_forvaltning, dict):
+                for forv_id, forv_data in medlemmar_per_forvaltning.items():
+                    if isinstance(forv_data, dict) and "enheter" in forv_data:
+                        enheter_data = forv_data["enheter"]
+                        if isinstance(enheter_data, dict):
+                            for enhet_id, antal in enheter_data.items():
+                                medlemmar_by_enhet[enhet_id] += antal
+
     # Beräkna medlemsantal för enheter
+    medlemmar_by_avd = defaultdict(int)
     for enhet in enheter:
-        total_members = 0
-        enhet_id = str(enhet["_id"])
-        
-        # Beräkna från specifika arbetsplatser
-        for arbetsplats in arbetsplatser:
-            if not arbetsplats.get("alla_forvaltningar"):
-                # Hantera specifika arbetsplatser
-                medlemmar_per_enhet = arbetsplats.get("medlemmar_per_enhet", {})
-                if isinstance(medlemmar_per_enhet, dict):
-                    total_members += medlemmar_per_enhet.get(enhet_id, 0)
-            else:
-                # Hantera regionala arbetsplatser
-                medlemmar_per_forvaltning = arbetsplats.get("medlemmar_per_forvaltning", {})
-                if isinstance(medlemmar_per_forvaltning, dict):
-                    for forv_id, forv_data in medlemmar_per_forvaltning.items():
-                        if isinstance(forv_data, dict) and "enheter" in forv_data:
-                            enheter_data = forv_data["enheter"]
-                            if isinstance(enheter_data, dict):
-                                total_members += enheter_data.get(enhet_id, 0)
+        total_members = medlemmar_by_enhet.get(str(enhet["_id"]), 0)
+        medlemmar_by_avd[str(enhet.get("avdelning_id"))] += total_members
 
         # Loggning för felsökning
         if total_members > 0:
@@ -99,16 +104,14 @@ def calculate_member_counts(db):
     # Utför batch-uppdateringar för enheter
     if enhet_updates:
         db.enheter.bulk_write(enhet_updates)
-    
-    # Uppdatera data efter enhetsuppdateringar
-    enheter = list(db.enheter.find())
 
     # Beräkna medlemsantal för avdelningar
+    medlemmar_by_forv = defaultdict(int)
     for avd in avdelningar:
         # Summera medlemsantal från tillhörande enheter
-        avd_enheter = [e for e in enheter if str(e.get("avdelning_id")) == str(avd["_id"])]
-        total_members = sum(e.get("beraknat_medlemsantal", 0) for e in avd_enheter)
-        
+        total_members = medlemmar_by_avd.get(str(avd["_id"]), 0)
+        medlemmar_by_forv[str(avd.get("forvaltning_id"))] += total_members
+
         # Loggning för felsökning
         if total_members > 0:
             print(f"Avdelning {avd['namn']}: {total_members} medlemmar")
@@ -122,15 +125,11 @@ def calculate_member_counts(db):
     # Utför batch-uppdateringar för avdelningar
     if avdelning_updates:
         db.avdelningar.bulk_write(avdelning_updates)
-    
-    # Uppdatera data efter avdelningsuppdateringar
-    avdelningar = list(db.avdelningar.find())
 
     # Beräkna medlemsantal för förvaltningar
     for forv in forvaltningar:
         # Summera medlemsantal från tillhörande avdelningar
-        forv_avdelningar = [a for a in avdelningar if str(a.get("forvaltning_id")) == str(forv["_id"])]
-        total_members = sum(a.get("beraknat_medlemsantal", 0) for a in forv_avdelningar)
+        total_members = medlemmar_by_forv.get(str(forv["_id"]), 0)
         
         # Loggning för felsökning
         if total_members > 0:
@@ -146,6 +145,9 @@ def calculate_member_counts(db):
     if forvaltning_updates:
         db.forvaltningar.bulk_write(forvaltning_updates)
 
+    # Medlemsantalen har skrivits om, läs in dem på nytt vid nästa hämtning
+    clear_collection_cache()
+
     # Markera att beräkning är klar
     st.session_state.needs_recalculation = False
 
@@ -164,8 +166,10 @@ def fix_missing_forvaltning_ids(db):
         'forvaltning_namn': {'$exists': True}
     })
     
+    updated = False
     for enhet in enheter_to_fix:
         if enhet['forvaltning_namn'] in forv_lookup:
+            updated = True
             # Uppdatera enheten med korrekt förvaltning_id
             db.enheter.update_one(
                 {'_id': enhet['_id']},
@@ -179,6 +183,10 @@ def fix_missing_forvaltning_ids(db):
                     {'$set': {'forvaltning_id': forv_lookup[enhet['forvaltning_namn']]}}
                 )
 
+    # Läs in de rättade enheterna på nytt vid nästa hämtning
+    if updated:
+        clear_collection_cache()
+
 
 def show(db):
     """
@@ -516,6 +524,7 @@ def show(db):
                                                 {"_id": {"$in": [ObjectId(ap_id) for ap_id in borttagna_ap_ids]}},
                                                 {"$unset": {"enhet_id": "", "enhet_namn": ""}}
                                             )
+                                            clear_collection_cache()
                                         
                                         # Konvertera valda arbetsplatser till lista med ID
                                         arbetsplats_ids = [
@@ -23,7 +23,7 @@ import streamlit as st
 import streamlit_nested_layout
 from collections import defaultdict
 from views.custom_logging import log_action
-from views.cache_manager import get_cached_data, update_cache_after_change
+from views.cache_manager import get_cached_data, update_cache_after_change, clear_collection_cache
 
 # Lista över alla kommuner i Västra Götaland, sorterad alfabetiskt
 # Används för att säkerställa konsistent inmatning av kommunnamn
@@ -86,6 +86,9 @@ def migrate_workplaces(db):
                         "forvaltning_namn": forvaltning["namn"]
                     })
 
+    # Låt alla sessioner läsa in de migrerade arbetsplatserna
+    clear_collection_cache()
+
 
 def create_indexes(db):
     """
@@ -456,12 +459,15 @@ def show(db):
                             else:
                                 st.write("*Inga medlemmar i denna förvaltning*")
                         
-                        # Spara medlemsdata för förvaltningen
-                        if total_medlemmar > 0:
+                        # Spara medlemsdata för förvaltningen om den har ändrats
+                        sparade_per_forv = regional_ap.setdefault('medlemmar_per_forv', {})
+                        if total_medlemmar > 0 and sparade_per_forv.get(str(forv['_id'])) != total_medlemmar:
                             db.arbetsplatser.update_one(
                                 {"_id": regional_ap["_id"]},
                                 {"$set": {f"medlemmar_per_forv.{str(forv['_id'])}": total_medlemmar}}
                             )
+                            sparade_per_forv[str(forv['_id'])] = total_medlemmar
+                            clear_collection_cache()
                         
                         # Visa totalt antal medlemmar för förvaltningen
                         st.write(f"**{forv['namn']}: {total_medlemmar} medlemmar**")
@@ -481,6 +487,8 @@ def show(db):
                             {"_id": ap["_id"]},
                             {"$set": {"beraknat_medlemsantal": nya_medlemmar}}
                         )
+                        ap['beraknat_medlemsantal'] = nya_medlemmar
+                        clear_collection_cache()
                         
                         # Uppdatera databasen och logga ändringar
                         if gamla_medlemmar != nya_medlemmar:
@@ -543,6 +551,8 @@ def show(db):
                             {"_id": ap["_id"]},
                             {"$set": {"beraknat_medlemsantal": nya_medlemmar}}
                         )
+                        ap['beraknat_medlemsantal'] = nya_medlemmar
+                        clear_collection_cache()
                         log_action(
                             "update",
                             f"Uppdaterade medlemsantal för {ap['namn']}: {gamla_medlemmar} -> {nya_medlemmar}",
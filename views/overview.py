@@ -23,7 +23,26 @@ Tekniska detaljer:
 
 import streamlit as st
 import pandas as pd
-from views.cache_manager import get_cached_data, update_cache_after_change
+from views.cache_manager import get_cached_data, get_cache_version, update_cache_after_change
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _personer_table(_personer, data_version):
+    """Bygger söktabellen över alla personer.
+
+    Tabellen cachas per dataversion och byggs alltså bara om när datan
+    ändrats, inte vid varje ny sökning.
+    """
+    return pd.DataFrame([{
+        'Namn': p['namn'],
+        'Förvaltning': p.get('forvaltning_namn', ''),
+        'Avdelning': p.get('avdelning_namn', ''),
+        'Enhet': p.get('enhet_namn', ''),
+        'Arbetsplats': p.get('arbetsplats', ''),
+        'Telefon': p.get('telefon', ''),
+        'Email': p.get('email', '')
+    } for p in _personer], columns=['Namn', 'Förvaltning', 'Avdelning', 'Enhet',
+                                    'Arbetsplats', 'Telefon', 'Email'])
 
 
 def show(db):
@@ -80,15 +99,18 @@ def show(db):
         search_query = st.text_input("🔍 Sök efter person, arbetsplats eller enhet (använd * för att visa alla)", "").lower()
         
         if search_query:
+            personer_table = _personer_table(cached['personer'], get_cache_version('personer'))
+
             # Om sökningen är "*", visa alla resultat
             if search_query == "*":
-                matching_personer = cached['personer']
+                df_personer = personer_table
                 matching_arbetsplatser = cached['arbetsplatser']
                 matching_enheter = cached['enheter']
             else:
                 # Sök i personer
-                matching_personer = [p for p in cached['personer'] 
-                                   if search_query in p.get('namn', '').lower()]
+                df_personer = personer_table[
+                    personer_table['Namn'].str.lower().str.contains(search_query, regex=False)
+                ]
                 
                 # Sök i arbetsplatser
                 matching_arbetsplatser = [a for a in cached['arbetsplatser'] 
@@ -99,17 +121,8 @@ def show(db):
                                   if search_query in e.get('namn', '').lower()]
 
             # Visa sökresultat
-            if matching_personer:
+            if not df_personer.empty:
                 st.markdown("### Personer")
-                df_personer = pd.DataFrame([{
-                    'Namn': p['namn'],
-                    'Förvaltning': p.get('forvaltning_namn', ''),
-                    'Avdelning': p.get('avdelning_namn', ''),
-                    'Enhet': p.get('enhet_namn', ''),
-                    'Arbetsplats': p.get('arbetsplats', ''),
-                    'Telefon': p.get('telefon', ''),
-                    'Email': p.get('email', '')
-                } for p in matching_personer])
                 # Konfigurera dataframe med horisontell scrollbar
                 st.dataframe(
                     df_personer,
@@ -146,5 +159,5 @@ def show(db):
                 } for e in matching_enheter])
                 st.dataframe(df_enheter, hide_index=True)
             
-            if not (matching_personer or matching_arbetsplatser or matching_enheter):
+            if df_personer.empty and not (matching_arbetsplatser or matching_enheter):
                 st.info("Inga träffar hittades för din sökning.")
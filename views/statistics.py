@@ -31,20 +31,54 @@ Tekniska detaljer:
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-import folium
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
 import json
-import colorsys
-from collections import defaultdict
+import os
+import tempfile
+try:
+    import orjson
+except ImportError:
+    orjson = None
+import copy
+from collections import ChainMap, Counter, defaultdict
 from bson import ObjectId
-from views.cache_manager import get_cached_data, update_cache_after_change
+from views.cache_manager import get_cached_data, get_cache_version, update_cache_after_change
 import plotly.graph_objects as go
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
+from pymongo import UpdateOne
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import time
 
 
+def _hsv_to_rgb(h, s, v):
+    """Omvandlar en array med nyanser till RGB med NumPy.
+
+    Samma formel som colorsys.hsv_to_rgb, men för alla nyanser på en gång.
+    Returnerar en (n, 3)-array med värden mellan 0 och 1.
+    """
+    sektor = (h * 6.0).astype(int)
+    f = h * 6.0 - sektor
+    v = np.full_like(h, v)
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    sektor %= 6
+    r = np.choose(sektor, [v, q, p, p, t, v])
+    g = np.choose(sektor, [t, v, v, q, p, p])
+    b = np.choose(sektor, [p, p, t, v, v, q])
+    return np.stack([r, g, b], axis=1)
+
+
+# Förberäknade hex-färger för 256 jämnt fördelade nyanser med fast
+# mättnad och ljusstyrka, så att färggenereringen bara blir uppslagningar
+_HEX_LUT = tuple(
+    '#%02x%02x%02x' % tuple(rgb)
+    for rgb in (_hsv_to_rgb(np.arange(256) / 256, 0.3, 0.9) * 255).astype(int).tolist()
+)
+
+
 def generate_distinct_colors(n):
     """Genererar en uppsättning visuellt distinkta färger.
     
@@ -60,68 +94,165 @@ def generate_distinct_colors(n):
     Tekniska detaljer:
     - Transparens för bättre visualisering
     - Konverterar till hex-format för webbkompatibilitet
+    - Hämtar färgerna ur en förberäknad tabell med 256 nyanser
     """
-    colors = []
-    for i in range(n):
-        hue = i / n
-        # Använd ljusa, transparenta färger för bättre visualisering
-        rgb = colorsys.hsv_to_rgb(hue, 0.3, 0.9)
-        hex_color = '#{:02x}{:02x}{:02x}'.format(
-            int(rgb[0] * 255),
-            int(rgb[1] * 255),
-            int(rgb[2] * 255)
-        )
-        colors.append(hex_color)
-    return colors
+    return [_HEX_LUT[i * 256 // n] for i in range(n)]
+
+
+# HTML för bock/kryss vid skyddsombudsmarkörerna. Bara två varianter finns,
+# så de byggs en gång här. DivIcon-objekten kan däremot inte delas mellan
+# markörer eftersom Folium knyter ikonen till sin förälder vid rendering.
+CHECK_HTML_OK = (
+    "<div style='text-align: center; line-height: 20px; font-size: 16px; color: green;'>✓</div>"
+)
+CHECK_HTML_SAKNAS = (
+    "<div style='text-align: center; line-height: 20px; font-size: 16px; color: red;'>✗</div>"
+)
+
+
+def _coordinate(arbetsplats, key):
+    """Returnerar en koordinat som flyttal, eller NaN om värdet saknas eller är ogiltigt."""
+    coordinates = arbetsplats['coordinates']
+    if not isinstance(coordinates, dict):
+        return np.nan
+    value = coordinates.get(key)
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+# Mall för popup-innehållet på kartan. Fylls i med format_map så att
+# alla fält sätts in i ett enda anrop.
+POPUP_TEMPLATE = (
+    "<div style='min-width: 200px'>"
+    "<h4>{namn}</h4>"
+    "<p><strong>Adress:</strong><br>"
+    "{gatuadress}<br>"
+    "{postnummer} {ort}</p>"
+    "<p><strong>Kommun:</strong> {kommun}</p>"
+    "<p><strong>Förvaltning:</strong> {forvaltning_namn}</p>"
+    "<div style='margin-top: 10px'><strong>Visionombud:</strong><br>{visionombud_html}</div>"
+    "<div style='margin-top: 10px'><strong>Skyddsombud:</strong><br>{skyddsombud_html}</div>"
+    "</div>"
+)
+
+# Standardvärden för fält som saknas på en arbetsplats
+_POPUP_DEFAULTS = {
+    'gatuadress': '',
+    'postnummer': '',
+    'ort': '',
+    'kommun': '',
+    'forvaltning_namn': 'Alla förvaltningar'
+}
+
+
+def _popup_html(arbetsplats, visionombud_html, skyddsombud_html):
+    """Bygger popup-innehållet för en arbetsplats på kartan.
+
+    Ombudslistorna skickas in färdigformaterade så att de bara behöver
+    sammanfogas en gång per arbetsplats.
+    """
+    view = ChainMap(
+        {'visionombud_html': visionombud_html, 'skyddsombud_html': skyddsombud_html},
+        arbetsplats,
+        _POPUP_DEFAULTS
+    )
+    return POPUP_TEMPLATE.format_map(view)
+
+
+# Skapar en cirkelmarkör för visionombud från en rad i klusterlagret
+VISIONOMBUD_MARKER_JS = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 8,
+        color: row[4] ? 'green' : 'red',
+        fill: true
+    });
+    marker.bindPopup(row[2], {maxWidth: 500});
+    marker.bindTooltip(row[3]);
+    return marker;
+}
+"""
 
 
-class StyleFunction:
-    """Hanterar stilsättning för geografiska element på kartan.
-    
-    Denna klass definierar utseendet för geografiska områden som
-    kommuner och regioner på kartan. Den implementerar en callable
-    interface för användning med Foliums style_function.
-    
-    Attribut:
-        color (str): Hex-färgkod för området
-    
-    Tekniska detaljer:
-    - Implementerar __call__ för användning som callback
-    - Definierar standardvärden för kartvisualisering
-    """
+# Kommungränser för hela Sverige och den sparade filtreringen för VG
+KOMMUNER_GEOJSON_PATH = 'data/kommuner.geo.json'
+VG_GEOJSON_PATH = 'data/kommuner_vg.geo.json'
+
+
+def _read_json(path):
+    """Läser en JSON-fil, med orjson om det finns installerat."""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Kommuner i Västra Götaland
+VG_KOMMUNER = frozenset([
+    'Ale kommun', 'Alingsås kommun', 'Bengtsfors kommun', 'Bollebygds kommun', 'Borås kommun',
+    'Dals-Eds kommun', 'Essunga kommun', 'Falköpings kommun', 'Färgelanda kommun', 'Grästorps kommun',
+    'Gullspångs kommun', 'Göteborgs kommun', 'Götene kommun', 'Herrljunga kommun', 'Hjo kommun',
+    'Härryda kommun', 'Karlsborgs kommun', 'Kungälvs kommun', 'Lerums kommun', 'Lidköpings kommun',
+    'Lilla Edets kommun', 'Lysekils kommun', 'Mariestads kommun', 'Marks kommun', 'Melleruds kommun',
+    'Munkedals kommun', 'Mölndals kommun', 'Orusts kommun', 'Partille kommun', 'Skara kommun',
+    'Skövde kommun', 'Sotenäs kommun', 'Stenungsunds kommun', 'Strömstads kommun', 'Svenljunga kommun',
+    'Tanums kommun', 'Tibro kommun', 'Tidaholms kommun', 'Tjörns kommun', 'Tranemo kommun',
+    'Trollhättans kommun', 'Töreboda kommun', 'Uddevalla kommun', 'Ulricehamns kommun', 'Vara kommun',
+    'Vårgårda kommun', 'Vänersborgs kommun', 'Åmåls kommun', 'Öckerö kommun',
+    # Specialfall
+    'Göteborgs stad', 'Göteborg stad', 'Borås stad', 'Trollhättans stad', 'Vänersborgs stad',
+    'Skövde stad', 'Lidköpings stad', 'Mölndals stad', 'Alingsås stad', 'Uddevalla stad'
+])
+
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _vg_features():
+    """Läser in kommungränserna för Västra Götaland som GeoJSON-features."""
+    # Använd den sparade VG-filtreringen om den finns och är aktuell
+    # Ogiltiga filer ignoreras, då filtreras källfilen om istället
+    if (os.path.exists(VG_GEOJSON_PATH)
+            and os.path.getmtime(VG_GEOJSON_PATH) >= os.path.getmtime(KOMMUNER_GEOJSON_PATH)):
+        try:
+            return _read_json(VG_GEOJSON_PATH)
+        except ValueError:
+            pass
+
+    # Läs in GeoJSON-data för kommuner
+    alla_kommuner = _read_json(KOMMUNER_GEOJSON_PATH)
+
+    # Filtrera fram VG-kommunerna
+    vg_features = []
+    for kommun in alla_kommuner:
+        if isinstance(kommun, dict) and 'geometry' in kommun:
+            namn = kommun.get('namn')
+            if namn in VG_KOMMUNER:
+                vg_features.append({
+                    "type": "Feature",
+                    "properties": {"name": namn},
+                    "geometry": kommun['geometry']
+                })
 
-    def __init__(self, color):
-        self.color = color
-
-    def __call__(self, feature):
-        """Returnerar stilattribut för ett geografiskt element.
-        
-        Args:
-            feature: GeoJSON-feature som ska stilsättas
-        
-        Returns:
-            dict: Stilattribut för elementet
-        """
-        return {
-            'fillColor': self.color,
-            'fillOpacity': 0.3,
-            'color': 'gray',
-            'weight': 1,
-            'dashArray': '5, 5'
-        }
+    # Spara filtreringen så att hela Sverige inte behöver läsas in nästa gång.
+    # Filen skrivs först till en temporär fil och flyttas sedan på plats, så
+    # att en avbruten skrivning aldrig lämnar en halv fil efter sig.
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(VG_GEOJSON_PATH), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(vg_features, f, ensure_ascii=False)
+        os.replace(tmp_path, VG_GEOJSON_PATH)
+    except OSError:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-    def __getstate__(self):
-        """Serialiserar objektet för caching."""
-        return {'color': self.color}
+    return vg_features
 
-    def __setstate__(self, state):
-        """Återställer objektet från cachad data."""
-        self.color = state['color']
 
+def _new_map():
+    """Skapar en tom karta över Västra Götaland, utan kommungränser."""
+    # Kartbiblioteket importeras först när kartan behövs, för snabbare appstart
+    import folium
 
-@st.cache_data(ttl=3600)  # Cache i 1 timme
-def load_map(_arbetsplatser, _personer, _db):
-    """Laddar och skapar kartan med alla arbetsplatser och ombud."""
     # Skapa en karta centrerad över Västra Götaland med begränsningar
     m = folium.Map(
         location=[58.2, 13.0],  # Centrerad över VGR
@@ -139,75 +270,88 @@ def load_map(_arbetsplatser, _personer, _db):
     # Sätt gränser för panorering
     m.fit_bounds([[56.0, 10.0], [60.0, 15.5]])
 
+    return m
+
+
+@st.cache_resource(show_spinner=False)
+def _base_map():
+    """Skapar grundkartan med kommungränser.
+
+    Kartan delas mellan alla sessioner och får aldrig ändras direkt,
+    den ska kopieras innan markörer läggs till.
+    """
+    import folium
+
+    m = _new_map()
+
     # Lägg till kommungränser som ett eget lager
     kommun_layer = folium.FeatureGroup(name="🏛️ Kommuner")
 
-    # Lista över kommuner i Västra Götaland
-    vg_kommuner_namn = [
-        'Ale kommun', 'Alingsås kommun', 'Bengtsfors kommun', 'Bollebygds kommun', 'Borås kommun',
-        'Dals-Eds kommun', 'Essunga kommun', 'Falköpings kommun', 'Färgelanda kommun', 'Grästorps kommun',
-        'Gullspångs kommun', 'Göteborgs kommun', 'Götene kommun', 'Herrljunga kommun', 'Hjo kommun',
-        'Härryda kommun', 'Karlsborgs kommun', 'Kungälvs kommun', 'Lerums kommun', 'Lidköpings kommun',
-        'Lilla Edets kommun', 'Lysekils kommun', 'Mariestads kommun', 'Marks kommun', 'Melleruds kommun',
-        'Munkedals kommun', 'Mölndals kommun', 'Orusts kommun', 'Partille kommun', 'Skara kommun',
-        'Skövde kommun', 'Sotenäs kommun', 'Stenungsunds kommun', 'Strömstads kommun', 'Svenljunga kommun',
-        'Tanums kommun', 'Tibro kommun', 'Tidaholms kommun', 'Tjörns kommun', 'Tranemo kommun',
-        'Trollhättans kommun', 'Töreboda kommun', 'Uddevalla kommun', 'Ulricehamns kommun', 'Vara kommun',
-        'Vårgårda kommun', 'Vänersborgs kommun', 'Åmåls kommun', 'Öckerö kommun',
-        # Specialfall
-        'Göteborgs stad', 'Göteborg stad', 'Borås stad', 'Trollhättans stad', 'Vänersborgs stad',
-        'Skövde stad', 'Lidköpings stad', 'Mölndals stad', 'Alingsås stad', 'Uddevalla stad'
-    ]
+    # Generera färger och lägg till på kartan. Fel i kommundatan får gå
+    # vidare, så att en karta utan kommungränser aldrig hamnar i cachen.
+    vg_features = _vg_features()
+    colors = generate_distinct_colors(len(vg_features))
+    colors_by_name = {
+        feature['properties']['name']: color
+        for feature, color in zip(vg_features, colors)
+    }
 
-    try:
-        # Läs in GeoJSON-data för kommuner
-        with open('data/kommuner.geo.json', 'r', encoding='utf-8') as f:
-            alla_kommuner = json.load(f)
-
-        # Filtrera VG-kommuner och lägg till på kartan
-        vg_features = []
-        for kommun in alla_kommuner:
-            if isinstance(kommun, dict) and 'geometry' in kommun:
-                namn = kommun.get('namn')
-                if namn in vg_kommuner_namn:
-                    vg_features.append({
-                        "type": "Feature",
-                        "properties": {
-                            "name": namn,
-                            "original": kommun
-                        },
-                        "geometry": kommun['geometry']
-                    })
-
-        # Generera färger och lägg till på kartan
-        colors = generate_distinct_colors(len(vg_features))
-        for feature, color in zip(vg_features, colors):
-            kommun_namn = feature['properties']['name']
-            style_function = StyleFunction(color)
-
-            geojson = folium.GeoJson(
-                feature,
-                name=kommun_namn,
-                style_function=style_function,
-                tooltip=kommun_namn
-            )
-            geojson.add_to(kommun_layer)
+    # En gemensam stilfunktion för alla kommuner, färgen slås upp på namnet
+    def style_function(feature):
+        return {
+            'fillColor': colors_by_name[feature['properties']['name']],
+            'fillOpacity': 0.3,
+            'color': 'gray',
+            'weight': 1,
+            'dashArray': '5, 5'
+        }
 
-    except Exception as e:
-        st.error(f"Fel vid hantering av kommundata: {str(e)}")
+    for feature in vg_features:
+        kommun_namn = feature['properties']['name']
+
+        geojson = folium.GeoJson(
+            feature,
+            name=kommun_namn,
+            style_function=style_function,
+            tooltip=kommun_namn
+        )
+        geojson.add_to(kommun_layer)
 
     # Lägg till kommunlagret till kartan
     kommun_layer.add_to(m)
 
-    # Skapa feature groups för olika typer av markörer
-    layers = {
-        'visionombud': folium.FeatureGroup(name="👁️ Visionombud"),
-        'skyddsombud': folium.FeatureGroup(name="🛡️ Skyddsombud")
-    }
+    return m
+
+
+@st.cache_resource(ttl=3600, max_entries=2, show_spinner="Bygger karta...")  # Cache i 1 timme, max två versioner
+def load_map(_arbetsplatser, _personer, _db, data_version):
+    """Laddar och skapar kartan med alla arbetsplatser och ombud.
+
+    Kartan cachas per dataversion, så den byggs bara om när datan ändras.
+    Resultatet delas utan kopiering mellan omkörningar och får därför
+    inte ändras av anroparen.
+
+    Returnerar kartan som färdigrenderad HTML, en tuple med arbetsplatser
+    som inte kunde placeras ut och ett felmeddelande om kommungränserna
+    inte kunde läsas in, annars None.
+    """
+    import folium
+    from folium.plugins import FastMarkerCluster
+
+    # Utgå från en kopia av den delade grundkartan med kommungränser. Går
+    # kommundatan inte att läsa ritas markörerna på en karta utan gränser.
+    kommun_fel = None
+    try:
+        m = copy.deepcopy(_base_map())
+    except Exception as e:
+        kommun_fel = str(e)
+        m = _new_map()
+
+    # Skyddsombuden visas först när lagret slås på
+    skyddsombud_layer = folium.FeatureGroup(name="🛡️ Skyddsombud", show=False)
 
-    # Lägg till alla lager till kartan
-    for layer in layers.values():
-        m.add_child(layer)
+    # Rader för visionombudens klusterlager: lat, lng, popup, tooltip, har ombud
+    visionombud_rader = []
 
     # Lista för misslyckade platser
     failed_locations = []
@@ -215,85 +359,64 @@ def load_map(_arbetsplatser, _personer, _db):
     # Räkna arbetsplatser med koordinater
     arbetsplatser_med_koordinater = [ap for ap in _arbetsplatser if ap.get('coordinates')]
 
-    for arbetsplats in arbetsplatser_med_koordinater:
+    # Kontrollera alla koordinater på en gång. Ogiltiga värden blir NaN.
+    antal = len(arbetsplatser_med_koordinater)
+    lats = np.fromiter((_coordinate(ap, 'lat') for ap in arbetsplatser_med_koordinater), float, count=antal)
+    lngs = np.fromiter((_coordinate(ap, 'lng') for ap in arbetsplatser_med_koordinater), float, count=antal)
+    giltiga = ~(np.isnan(lats) | np.isnan(lngs))
+    inom_vg = giltiga & (lats >= 56.0) & (lats <= 60.0) & (lngs >= 10.0) & (lngs <= 15.5)
+
+    for i in np.flatnonzero(~giltiga):
+        arbetsplats = arbetsplatser_med_koordinater[i]
+        failed_locations.append(f"{arbetsplats.get('namn', 'Okänd arbetsplats')} - Ogiltiga koordinater")
+
+    for i in np.flatnonzero(giltiga & ~inom_vg):
+        arbetsplats = arbetsplatser_med_koordinater[i]
+        failed_locations.append(
+            f"{arbetsplats.get('namn', 'Okänd arbetsplats')} - Koordinater utanför VG-regionen")
+
+    # Gruppera ombuden per arbetsplats i en genomgång av personerna
+    visionombud_by_ap = defaultdict(list)
+    skyddsombud_by_ap = defaultdict(list)
+    for p in _personer:
+        if not (p.get('visionombud') or p.get('skyddsombud')):
+            continue
+        label = f"{p.get('namn', '')} ({p.get('forvaltning_namn', '')})"
+        for ap_namn in dict.fromkeys(p.get('arbetsplats') or []):
+            if p.get('visionombud'):
+                visionombud_by_ap[ap_namn].append(label)
+            if p.get('skyddsombud'):
+                skyddsombud_by_ap[ap_namn].append(label)
+
+    for i in np.flatnonzero(inom_vg):
+        arbetsplats = arbetsplatser_med_koordinater[i]
         try:
-            # Kontrollera att koordinaterna är giltiga
-            if not arbetsplats.get("coordinates") or \
-                    not isinstance(arbetsplats["coordinates"].get("lat"), (int, float)) or \
-                    not isinstance(arbetsplats["coordinates"].get("lng"), (int, float)):
-                failed_locations.append(f"{arbetsplats.get('namn', 'Okänd arbetsplats')} - Ogiltiga koordinater")
-                continue
-
             # Hämta koordinater
             location = [
                 arbetsplats["coordinates"]["lat"],
                 arbetsplats["coordinates"]["lng"]
             ]
 
-            # Kontrollera att koordinaterna är inom rimliga gränser
-            if not (56.0 <= location[0] <= 60.0 and 10.0 <= location[1] <= 15.5):
-                failed_locations.append(
-                    f"{arbetsplats.get('namn', 'Okänd arbetsplats')} - Koordinater utanför VG-regionen")
-                continue
-
             # Hitta ombud för denna arbetsplats
-            visionombud_list = [
-                f"{p.get('namn', '')} ({p.get('forvaltning_namn', '')})"
-                for p in _personer
-                if p.get('visionombud') and arbetsplats['namn'] in p.get('arbetsplats', [])
-            ]
-
-            skyddsombud_list = [
-                f"{p.get('namn', '')} ({p.get('forvaltning_namn', '')})"
-                for p in _personer
-                if p.get('skyddsombud') and arbetsplats['namn'] in p.get('arbetsplats', [])
-            ]
+            visionombud_list = visionombud_by_ap.get(arbetsplats['namn'], [])
+            skyddsombud_list = skyddsombud_by_ap.get(arbetsplats['namn'], [])
 
             har_visionombud = len(visionombud_list) > 0
             har_skyddsombud = len(skyddsombud_list) > 0
 
             # Skapa popup-innehåll
-            popup_text = f"""
-            <div style='min-width: 200px'>
-                <h4>{arbetsplats['namn']}</h4>
-                <p><strong>Adress:</strong><br>
-                {arbetsplats.get('gatuadress', '')}<br>
-                {arbetsplats.get('postnummer', '')} {arbetsplats.get('ort', '')}</p>
-                <p><strong>Kommun:</strong> {arbetsplats.get('kommun', '')}</p>
-                <p><strong>Förvaltning:</strong> {arbetsplats.get('forvaltning_namn', 'Alla förvaltningar')}</p>
-                
-                <div style='margin-top: 10px'>
-                    <strong>Visionombud:</strong><br>
-                    {'<br>'.join(visionombud_list) if visionombud_list else 'Saknas'}
-                </div>
-                
-                <div style='margin-top: 10px'>
-                    <strong>Skyddsombud:</strong><br>
-                    {'<br>'.join(skyddsombud_list) if skyddsombud_list else 'Saknas'}
-                </div>
-            </div>
-            """
+            popup_text = _popup_html(
+                arbetsplats,
+                '<br>'.join(visionombud_list) or 'Saknas',
+                '<br>'.join(skyddsombud_list) or 'Saknas'
+            )
 
             # Skapa tooltips
             vision_tooltip = f"{arbetsplats['namn']} - {'Har' if har_visionombud else 'Saknar'} Visionombud"
             skydd_tooltip = f"{arbetsplats['namn']} - {'Har' if har_skyddsombud else 'Saknar'} Skyddsombud"
 
-            # HTML för bock/kryss
-            check_html = f"""
-                <div style='text-align: center; line-height: 20px; font-size: 16px; color: {'green' if har_skyddsombud else 'red'};'>
-                    {'✓' if har_skyddsombud else '✗'}
-                </div>
-            """
-
             # Lägg till cirkelmarkör för Visionombud
-            folium.CircleMarker(
-                location=location,
-                radius=8,
-                popup=folium.Popup(popup_text, max_width=500),
-                tooltip=vision_tooltip,
-                color='green' if har_visionombud else 'red',
-                fill=True
-            ).add_to(layers['visionombud'])
+            visionombud_rader.append([location[0], location[1], popup_text, vision_tooltip, har_visionombud])
 
             # Lägg till bock/kryss för Skyddsombud
             folium.Marker(
@@ -301,16 +424,25 @@ def load_map(_arbetsplatser, _personer, _db):
                 popup=folium.Popup(popup_text, max_width=500),
                 tooltip=skydd_tooltip,
                 icon=folium.DivIcon(
-                    html=check_html,
+                    html=CHECK_HTML_OK if har_skyddsombud else CHECK_HTML_SAKNAS,
                     icon_size=(20, 20),
                     icon_anchor=(10, 10)
                 )
-            ).add_to(layers['skyddsombud'])
+            ).add_to(skyddsombud_layer)
 
         except Exception as e:
             failed_locations.append(f"{arbetsplats.get('namn', 'Okänd arbetsplats')} - {str(e)}")
             continue
 
+    # Visionombuden klustras och cirklarna skapas i webbläsaren av en
+    # gemensam JS-funktion, så bara synliga markörer ritas ut
+    FastMarkerCluster(
+        visionombud_rader,
+        callback=VISIONOMBUD_MARKER_JS,
+        name="👁️ Visionombud"
+    ).add_to(m)
+    skyddsombud_layer.add_to(m)
+
     # Lägg till lager-kontroll
     folium.LayerControl(
         position='topright',
@@ -318,20 +450,54 @@ def load_map(_arbetsplatser, _personer, _db):
         autoZIndex=True
     ).add_to(m)
 
-    return m, failed_locations
+    # Rendera kartan till HTML en gång, så att cachen bara håller en sträng
+    return m.get_root().render(), tuple(failed_locations), kommun_fel
+
+
+# Antal samtidiga geokodningar. Nominatims hastighetsgräns upprätthålls
+# ändå av den delade geokodaren, trådarna överlappar bara nätverksväntan.
+GEOCODE_MAX_WORKERS = 4
+
+
+@st.cache_resource(show_spinner=False)
+def _geocoder():
+    """Returnerar en delad Nominatim-geokodare begränsad till en förfrågan per sekund.
+
+    Geokodaren delas mellan alla sessioner och trådar, så att gränsen i
+    Nominatims användarvillkor gäller för hela appen.
+    """
+    # Geokodningsbiblioteket importeras först när det behövs, för snabbare appstart
+    from geopy.geocoders import Nominatim
+    from geopy.extra.rate_limiter import RateLimiter
+
+    geolocator = Nominatim(user_agent="vision_sektion10")
+    return RateLimiter(geolocator.geocode, min_delay_seconds=1, swallow_exceptions=False)
+
+
+@st.cache_data(persist="disk", show_spinner=False)
+def _geocode_cached(address_key):
+    """Slår upp koordinater för en normaliserad adress hos Nominatim.
+
+    Resultatet sparas på disk så att kända adresser aldrig frågas efter igen.
+    Fel kastas vidare och cachas därför inte.
+    """
+    address, city, municipality = address_key
+    # Kombinera adress med stad och kommun för bättre träffsäkerhet
+    full_address = f"{address}, {city}, {municipality}, Västra Götaland, Sweden"
+    location = _geocoder()(full_address)
+
+    if location:
+        return {"lat": location.latitude, "lng": location.longitude}
+    return None
 
 
 def geocode_address(address, city, municipality):
     """Konverterar en adress till koordinater med hjälp av Nominatim."""
-    try:
-        geolocator = Nominatim(user_agent="vision_sektion10")
-        # Kombinera adress med stad och kommun för bättre träffsäkerhet
-        full_address = f"{address}, {city}, {municipality}, Västra Götaland, Sweden"
-        location = geolocator.geocode(full_address)
+    from geopy.exc import GeocoderTimedOut
 
-        if location:
-            return {"lat": location.latitude, "lng": location.longitude}
-        return None
+    address_key = tuple(str(part).strip().lower() for part in (address, city, municipality))
+    try:
+        return _geocode_cached(address_key)
     except GeocoderTimedOut:
         time.sleep(1)  # Vänta en sekund och försök igen
         return geocode_address(address, city, municipality)
@@ -340,6 +506,22 @@ def geocode_address(address, city, municipality):
         return None
 
 
+def _geocode_one(arbetsplats):
+    """Geokodar en arbetsplats.
+
+    Returnerar arbetsplatsens id och koordinater, där koordinaterna är
+    None om adressuppgifter saknas eller adressen inte hittades.
+    """
+    coordinates = None
+    if arbetsplats.get('gatuadress') and arbetsplats.get('ort') and arbetsplats.get('kommun'):
+        coordinates = geocode_address(
+            arbetsplats['gatuadress'],
+            arbetsplats['ort'],
+            arbetsplats['kommun']
+        )
+    return arbetsplats['_id'], coordinates
+
+
 def generate_missing_coordinates(db, arbetsplatser):
     """Genererar koordinater för arbetsplatser som saknar dem."""
     updated_count = 0
@@ -348,48 +530,141 @@ def generate_missing_coordinates(db, arbetsplatser):
     progress_bar = st.progress(0)
     status_text = st.empty()
 
-    total = len([ap for ap in arbetsplatser if not ap.get('coordinates')])
-    current = 0
-
-    for arbetsplats in arbetsplatser:
-        if not arbetsplats.get('coordinates'):
-            current += 1
-            progress = current / total
-            progress_bar.progress(progress)
+    saknar_koordinater = [ap for ap in arbetsplatser if not ap.get('coordinates')]
+    total = len(saknar_koordinater)
+    updates = []
+
+    # Geokoda parallellt. Trådarna får Streamlits körkontext så att cache
+    # och felmeddelanden fungerar även utanför huvudtråden.
+    with ThreadPoolExecutor(max_workers=GEOCODE_MAX_WORKERS, initializer=add_script_run_ctx,
+                            initargs=(None, get_script_run_ctx())) as executor:
+        results = executor.map(_geocode_one, saknar_koordinater)
+        for current, (arbetsplats_id, coordinates) in enumerate(results, start=1):
+            progress_bar.progress(current / total)
             status_text.text(f"Bearbetar {current} av {total} arbetsplatser...")
 
-            if arbetsplats.get('gatuadress') and arbetsplats.get('ort') and arbetsplats.get('kommun'):
-                coordinates = geocode_address(
-                    arbetsplats['gatuadress'],
-                    arbetsplats['ort'],
-                    arbetsplats['kommun']
-                )
-
-                if coordinates:
-                    # Uppdatera databasen med de nya koordinaterna
-                    result = db.arbetsplatser.update_one(
-                        {"_id": arbetsplats["_id"]},
-                        {"$set": {"coordinates": coordinates}}
-                    )
-                    if result.modified_count > 0:
-                        updated_count += 1
-                else:
-                    failed_count += 1
+            if coordinates:
+                updates.append(UpdateOne(
+                    {"_id": arbetsplats_id},
+                    {"$set": {"coordinates": coordinates}}
+                ))
             else:
                 failed_count += 1
 
+    # Uppdatera databasen med alla nya koordinater i ett anrop
+    if updates:
+        result = db.arbetsplatser.bulk_write(updates, ordered=False)
+        updated_count = result.modified_count
+
     progress_bar.empty()
     status_text.empty()
 
     return updated_count, failed_count
 
 
+def _grouped_bar(df, xcol, ycols, title, colors=None, hover_col=None):
+    """Skapar ett grupperat stapeldiagram med en stapel per kolumn i ycols.
+
+    Datan är redan aggregerad, så diagrammet byggs direkt med go.Bar
+    istället för via plotly.express som grupperar datan internt.
+    """
+    fig = go.Figure()
+    for i, ycol in enumerate(ycols):
+        bar_kwargs = {}
+        if hover_col:
+            bar_kwargs['customdata'] = df[hover_col]
+            bar_kwargs['hovertemplate'] = (
+                f"{xcol}=%{{x}}<br>{ycol}=%{{y}}<br>{hover_col}=%{{customdata}}<extra></extra>"
+            )
+        fig.add_bar(
+            name=ycol,
+            x=df[xcol],
+            y=df[ycol],
+            marker_color=colors[i] if colors else None,
+            **bar_kwargs
+        )
+    fig.update_layout(barmode='group', title=title, xaxis_title=xcol)
+    return fig
+
+
+# Nivåer i ombudsstatistiken: rubrik, samling i cachen, nyckel i den
+# aggregerade statistiken och hur en enhets namn visas i tabellen
+STATS_LEVELS = [
+    ("Förvaltning", 'forvaltningar', 'forv',
+     lambda unit: unit['namn']),
+    ("Avdelning", 'avdelningar', 'avd',
+     lambda unit: f"{unit['namn']} ({unit['forvaltning_namn']})"),
+    ("Enhet", 'enheter', 'enhet',
+     lambda unit: f"{unit['namn']} ({unit['avdelning_namn']}, {unit['forvaltning_namn']})")
+]
+
+
+def ratio_str(members, reps):
+    """Formaterar medlemmar per ombud, eller ett streck om ombud saknas."""
+    return f"{members / reps:.1f}" if reps else "—"
+
+
+def _visible_units(units, rep_counts):
+    """Filtrerar fram de enheter som har ombud eller medlemmar."""
+    return [
+        unit for unit in units
+        if rep_counts[unit['_sid']] or unit.get('beraknat_medlemsantal', 0) > 0
+    ]
+
+
+def _unit_table(units, rep_counts, rep_label, label_func):
+    """Bygger en tabell med medlemmar och ombud för en organisationsnivå."""
+    rows = []
+    for unit in _visible_units(units, rep_counts):
+        members = unit.get('beraknat_medlemsantal', 0)
+        reps = rep_counts[unit['_sid']]
+        rows.append({
+            'Namn': label_func(unit),
+            'Medlemmar': members,
+            rep_label: reps,
+            f'Medlemmar per {rep_label}': members / reps if reps and members > 0 else None
+        })
+    return pd.DataFrame(rows, columns=['Namn', 'Medlemmar', rep_label, f'Medlemmar per {rep_label}'])
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _agg_stats(_personer, _forvaltningar, data_version):
+    """Räknar ombud per förvaltning, avdelning och enhet.
+
+    Personerna görs om till parallella NumPy-arrayer: en heltalskod per
+    organisationsnivå och en boolesk mask per ombudstyp. Varje nivå räknas
+    sedan med en enda np.bincount. Resultatet cachas per dataversion, så att
+    omkörningar av sidan bara blir en uppslagning så länge datan inte ändrats.
+    """
+    antal = len(_personer)
+    masks = {
+        'vision': np.fromiter((bool(p.get('visionombud')) for p in _personer), bool, count=antal),
+        'safety': np.fromiter((bool(p.get('skyddsombud')) for p in _personer), bool, count=antal)
+    }
+
+    stats = {typ: {'total': int(mask.sum())} for typ, mask in masks.items()}
+    for level, key in (('forv', '_forv_sid'), ('avd', '_avd_sid'), ('enhet', '_enhet_sid')):
+        codes, sids = pd.factorize(np.array([p[key] for p in _personer], dtype=object))
+        for typ, mask in masks.items():
+            counts = np.bincount(codes[mask], minlength=len(sids))
+            stats[typ][level] = Counter(dict(zip(sids, counts.tolist())))
+
+    forvaltningar_df = pd.DataFrame(_forvaltningar, columns=['beraknat_medlemsantal'])
+    stats['members_total'] = int(forvaltningar_df['beraknat_medlemsantal'].fillna(0).sum())
+    return stats
+
+
 def show(db):
     """Visar statistik och grafer för organisationen."""
     st.header("Statistik")
 
     # Ladda cachad data
     cached, indexes = get_cached_data(db)
+    alla_arbetsplatsnamn = {ap['namn'] for ap in cached['arbetsplatser']}
+
+    # Hämta förberäknad ombudsstatistik för den aktuella datan
+    stats = _agg_stats(cached['personer'], cached['forvaltningar'],
+                       get_cache_version('personer', 'forvaltningar'))
 
     # Skapa flikar för olika typer av statistik
     tab1, tab2, tab3, tab4 = st.tabs([
@@ -408,9 +683,9 @@ def show(db):
         total_forvaltningar = len(cached['forvaltningar'])
         total_avdelningar = len(cached['avdelningar'])
         total_enheter = len(cached['enheter'])
-        total_visionombud = len([p for p in cached['personer'] if p.get('visionombud', False)])
-        total_skyddsombud = len([p for p in cached['personer'] if p.get('skyddsombud', False)])
-        total_members = sum(f.get('beraknat_medlemsantal', 0) for f in cached['forvaltningar'])
+        total_visionombud = stats['vision']['total']
+        total_skyddsombud = stats['safety']['total']
+        total_members = stats['members_total']
 
         # Visa nyckeltal i kolumner
         col1, col2, col3 = st.columns(3)
@@ -446,9 +721,8 @@ def show(db):
         # Skapa stapeldiagram för ombud per förvaltning
         ombud_data = []
         for forv in cached['forvaltningar']:
-            forv_personer = [p for p in cached['personer'] if str(p.get('forvaltning_id')) == str(forv['_id'])]
-            vision_count = len([p for p in forv_personer if p.get('visionombud', False)])
-            skydd_count = len([p for p in forv_personer if p.get('skyddsombud', False)])
+            vision_count = stats['vision']['forv'][forv['_sid']]
+            skydd_count = stats['safety']['forv'][forv['_sid']]
             if vision_count > 0 or skydd_count > 0:
                 ombud_data.append({
                     'Förvaltning': forv['namn'],
@@ -458,12 +732,11 @@ def show(db):
 
         if ombud_data:
             df = pd.DataFrame(ombud_data)
-            fig = px.bar(
+            fig = _grouped_bar(
                 df,
-                x='Förvaltning',
-                y=['Visionombud', 'Skyddsombud'],
-                title="Fördelning av ombud per förvaltning",
-                barmode='group'
+                'Förvaltning',
+                ['Visionombud', 'Skyddsombud'],
+                "Fördelning av ombud per förvaltning"
             )
             st.plotly_chart(fig, key="bar_ombud_per_forv")
 
@@ -488,15 +761,21 @@ def show(db):
             )
             st.plotly_chart(fig, key="bar_arbetsplatser_per_forv")
 
+        # Räkna ombud per arbetsplats i en genomgång av personerna
+        vision_per_ap = Counter()
+        skydd_per_ap = Counter()
+        for person in cached['personer']:
+            person_arbetsplatser = set(person.get('arbetsplats') or ())
+            if person.get('visionombud'):
+                vision_per_ap.update(person_arbetsplatser)
+            if person.get('skyddsombud'):
+                skydd_per_ap.update(person_arbetsplatser)
+
         # Ny graf: Jämförelse av ombud per arbetsplats
         arbetsplats_ombud_data = []
         for arbetsplats in cached['arbetsplatser']:
-            vision_count = len([p for p in cached['personer']
-                                if p.get('visionombud', False) and
-                                arbetsplats['namn'] in p.get('arbetsplats', [])])
-            skydd_count = len([p for p in cached['personer']
-                               if p.get('skyddsombud', False) and
-                               arbetsplats['namn'] in p.get('arbetsplats', [])])
+            vision_count = vision_per_ap[arbetsplats['namn']]
+            skydd_count = skydd_per_ap[arbetsplats['namn']]
 
             if vision_count > 0 or skydd_count > 0:
                 arbetsplats_ombud_data.append({
@@ -514,14 +793,13 @@ def show(db):
             )
 
             df = pd.DataFrame(arbetsplats_ombud_data)
-            fig = px.bar(
+            fig = _grouped_bar(
                 df,
-                x='Arbetsplats',
-                y=['Visionombud', 'Skyddsombud'],
-                title="Antal ombud per arbetsplats",
-                barmode='group',
-                color_discrete_sequence=['#2ecc71', '#e74c3c'],
-                hover_data=['Förvaltning']
+                'Arbetsplats',
+                ['Visionombud', 'Skyddsombud'],
+                "Antal ombud per arbetsplats",
+                colors=['#2ecc71', '#e74c3c'],
+                hover_col='Förvaltning'
             )
             fig.update_layout(
                 xaxis_tickangle=-45,
@@ -535,9 +813,8 @@ def show(db):
         # Ny graf: Detaljerad jämförelse av ombud per förvaltning
         forvaltning_ombud_data = []
         for forv in cached['forvaltningar']:
-            forv_personer = [p for p in cached['personer'] if str(p.get('forvaltning_id')) == str(forv['_id'])]
-            vision_count = len([p for p in forv_personer if p.get('visionombud', False)])
-            skydd_count = len([p for p in forv_personer if p.get('skyddsombud', False)])
+            vision_count = stats['vision']['forv'][forv['_sid']]
+            skydd_count = stats['safety']['forv'][forv['_sid']]
             total_arbetsplatser = len([ap for ap in cached['arbetsplatser']
                                        if ap.get('forvaltning_id') == forv['_id']])
 
@@ -560,13 +837,12 @@ def show(db):
             col1, col2 = st.columns(2)
 
             with col1:
-                fig1 = px.bar(
+                fig1 = _grouped_bar(
                     df,
-                    x='Förvaltning',
-                    y=['Visionombud', 'Skyddsombud'],
-                    title="Totalt antal ombud per förvaltning",
-                    barmode='group',
-                    color_discrete_sequence=['#2ecc71', '#e74c3c']
+                    'Förvaltning',
+                    ['Visionombud', 'Skyddsombud'],
+                    "Totalt antal ombud per förvaltning",
+                    colors=['#2ecc71', '#e74c3c']
                 )
                 fig1.update_layout(
                     xaxis_tickangle=-45,
@@ -578,13 +854,12 @@ def show(db):
                 st.plotly_chart(fig1, key="bar_total_ombud_per_forv")
 
             with col2:
-                fig2 = px.bar(
+                fig2 = _grouped_bar(
                     df,
-                    x='Förvaltning',
-                    y=['Visionombud per arbetsplats', 'Skyddsombud per arbetsplats'],
-                    title="Genomsnittligt antal ombud per arbetsplats och förvaltning",
-                    barmode='group',
-                    color_discrete_sequence=['#2ecc71', '#e74c3c']
+                    'Förvaltning',
+                    ['Visionombud per arbetsplats', 'Skyddsombud per arbetsplats'],
+                    "Genomsnittligt antal ombud per arbetsplats och förvaltning",
+                    colors=['#2ecc71', '#e74c3c']
                 )
                 fig2.update_layout(
                     xaxis_tickangle=-45,
@@ -600,9 +875,8 @@ def show(db):
         for forv in cached['forvaltningar']:
             members = forv.get('beraknat_medlemsantal', 0)
             if members > 0:
-                forv_personer = [p for p in cached['personer'] if str(p.get('forvaltning_id')) == str(forv['_id'])]
-                vision_count = len([p for p in forv_personer if p.get('visionombud', False)])
-                skydd_count = len([p for p in forv_personer if p.get('skyddsombud', False)])
+                vision_count = stats['vision']['forv'][forv['_sid']]
+                skydd_count = stats['safety']['forv'][forv['_sid']]
 
                 comparison_data.append({
                     'Förvaltning': forv['namn'],
@@ -612,29 +886,23 @@ def show(db):
 
         if comparison_data:
             df = pd.DataFrame(comparison_data)
-            fig = px.bar(
+            fig = _grouped_bar(
                 df,
-                x='Förvaltning',
-                y=['Medlemmar per Visionombud', 'Medlemmar per Skyddsombud'],
-                title="Medlemmar per ombud per förvaltning",
-                barmode='group'
+                'Förvaltning',
+                ['Medlemmar per Visionombud', 'Medlemmar per Skyddsombud'],
+                "Medlemmar per ombud per förvaltning"
             )
             st.plotly_chart(fig, key="bar_medlemmar_per_ombud")
 
         # Visa täckningsgrad för ombud
         st.subheader("Täckningsgrad för ombud")
 
-        # Beräkna täckningsgrad för arbetsplatser
-        arbetsplatser_med_vision = set()
-        arbetsplatser_med_skydd = set()
-
-        for person in cached['personer']:
-            if person.get('visionombud') and person.get('arbetsplats'):
-                arbetsplatser_med_vision.update(person['arbetsplats'])
-            if person.get('skyddsombud') and person.get('arbetsplats'):
-                arbetsplatser_med_skydd.update(person['arbetsplats'])
+        # Beräkna täckningsgrad för arbetsplatser utifrån räkningen ovan
+        arbetsplatser_med_vision = set(vision_per_ap)
+        arbetsplatser_med_skydd = set(skydd_per_ap)
 
-        total_arbetsplatser = len(set(ap['namn'] for ap in cached['arbetsplatser']))
+        total_arbetsplatser = len(alla_arbetsplatsnamn)
+        arbetsplatser_med_ombud = len(arbetsplatser_med_vision | arbetsplatser_med_skydd)
 
         coverage_data = [{
             'Typ': 'Arbetsplatser med Visionombud',
@@ -646,9 +914,8 @@ def show(db):
             'Procent': round(len(arbetsplatser_med_skydd) / total_arbetsplatser * 100, 1)
         }, {
             'Typ': 'Arbetsplatser utan ombud',
-            'Antal': total_arbetsplatser - len(arbetsplatser_med_vision.union(arbetsplatser_med_skydd)),
-            'Procent': round((total_arbetsplatser - len(
-                arbetsplatser_med_vision.union(arbetsplatser_med_skydd))) / total_arbetsplatser * 100, 1)
+            'Antal': total_arbetsplatser - arbetsplatser_med_ombud,
+            'Procent': round((total_arbetsplatser - arbetsplatser_med_ombud) / total_arbetsplatser * 100, 1)
         }]
 
         df = pd.DataFrame(coverage_data)
@@ -666,187 +933,43 @@ def show(db):
     with tab3:
         st.subheader("Ombudsstatistik")
 
-        stats_tab1, stats_tab2 = st.tabs(["Visionombud", "Skyddsombud"])
-
-        with stats_tab1:
-            # Hjälpfunktion för att räkna Visionombud
-            def count_vision_reps(personer_list, filter_func=None):
-                """Räknar antalet Visionombud baserat på givna filter."""
-                if filter_func:
-                    personer_list = [p for p in personer_list if filter_func(p)]
-                return len([p for p in personer_list if p.get("visionombud", False)])
-
-            # Översikt av totala antal
-            st.markdown("### Total Översikt")
-            total_members = sum(f.get('beraknat_medlemsantal', 0) for f in cached['forvaltningar'])
-            total_reps = count_vision_reps(cached['personer'])
-
-            # Visa totala mätvärden
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Totalt antal medlemmar", total_members)
-            with col2:
-                st.metric("Totalt antal Visionombud", total_reps)
-
-            if total_members > 0:
-                st.metric("Medlemmar per Visionombud",
-                          round(total_members / total_reps if total_reps > 0 else float('inf'), 1))
-
-            # Statistik per förvaltning
-            st.markdown("### Per Förvaltning")
-            for forv in cached['forvaltningar']:
-                # Räkna ombud för denna förvaltning
-                reps = count_vision_reps(cached['personer'],
-                                         lambda p: str(p.get('forvaltning_id')) == str(forv['_id']))
-
-                # Visa om det finns ombud eller medlemmar
-                if reps > 0 or forv.get('beraknat_medlemsantal', 0) > 0:
-                    with st.expander(f"{forv['namn']}"):
-                        members = forv.get('beraknat_medlemsantal', 0)
-
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Antal medlemmar", members)
-                        with col2:
-                            st.metric("Antal Visionombud", reps)
-
-                        if members > 0:
-                            st.metric("Medlemmar per Visionombud",
-                                      round(members / reps if reps > 0 else float('inf'), 1))
-
-            # Statistik per avdelning
-            st.markdown("### Per Avdelning")
-            for avd in cached['avdelningar']:
-                # Räkna ombud för denna avdelning
-                reps = count_vision_reps(cached['personer'],
-                                         lambda p: str(p.get('avdelning_id')) == str(avd['_id']))
-
-                # Visa om det finns ombud eller medlemmar
-                if reps > 0 or avd.get('beraknat_medlemsantal', 0) > 0:
-                    with st.expander(f"{avd['namn']} ({avd['forvaltning_namn']})"):
-                        members = avd.get('beraknat_medlemsantal', 0)
-
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Antal medlemmar", members)
-                        with col2:
-                            st.metric("Antal Visionombud", reps)
-
-                        if members > 0:
-                            st.metric("Medlemmar per Visionombud",
-                                      round(members / reps if reps > 0 else float('inf'), 1))
-
-            # Statistik per enhet
-            st.markdown("### Per Enhet")
-            for enhet in cached['enheter']:
-                # Räkna ombud för denna enhet
-                reps = count_vision_reps(cached['personer'],
-                                         lambda p: str(p.get('enhet_id')) == str(enhet['_id']))
-
-                # Visa om det finns ombud eller medlemmar
-                if reps > 0 or enhet.get('beraknat_medlemsantal', 0) > 0:
-                    with st.expander(f"{enhet['namn']} ({enhet['avdelning_namn']}, {enhet['forvaltning_namn']})"):
-                        members = enhet.get('beraknat_medlemsantal', 0)
-
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Antal medlemmar", members)
-                        with col2:
-                            st.metric("Antal Visionombud", reps)
-
-                        if members > 0:
-                            st.metric("Medlemmar per Visionombud",
-                                      round(members / reps if reps > 0 else float('inf'), 1))
-
-        with stats_tab2:
-            # Hjälpfunktion för att räkna Skyddsombud
-            def count_safety_reps(personer_list, filter_func=None):
-                """Räknar antalet Skyddsombud baserat på givna filter."""
-                if filter_func:
-                    personer_list = [p for p in personer_list if filter_func(p)]
-                return len([p for p in personer_list if p.get("skyddsombud", False)])
-
-            # Översikt av totala antal
-            st.markdown("### Total Översikt")
-            total_members = sum(f.get('beraknat_medlemsantal', 0) for f in cached['forvaltningar'])
-            total_reps = count_safety_reps(cached['personer'])
-
-            # Visa totala mätvärden
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Totalt antal medlemmar", total_members)
-            with col2:
-                st.metric("Totalt antal Skyddsombud", total_reps)
-
-            if total_members > 0:
-                st.metric("Medlemmar per Skyddsombud",
-                          round(total_members / total_reps if total_reps > 0 else float('inf'), 1))
-
-            # Statistik per förvaltning
-            st.markdown("### Per Förvaltning")
-            for forv in cached['forvaltningar']:
-                # Räkna ombud för denna förvaltning
-                reps = count_safety_reps(cached['personer'],
-                                         lambda p: str(p.get('forvaltning_id')) == str(forv['_id']))
-
-                # Visa om det finns ombud eller medlemmar
-                if reps > 0 or forv.get('beraknat_medlemsantal', 0) > 0:
-                    with st.expander(f"{forv['namn']}"):
-                        members = forv.get('beraknat_medlemsantal', 0)
-
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Antal medlemmar", members)
-                        with col2:
-                            st.metric("Antal Skyddsombud", reps)
-
-                        if members > 0:
-                            st.metric("Medlemmar per Skyddsombud",
-                                      round(members / reps if reps > 0 else float('inf'), 1))
-
-            # Statistik per avdelning
-            st.markdown("### Per Avdelning")
-            for avd in cached['avdelningar']:
-                # Räkna ombud för denna avdelning
-                reps = count_safety_reps(cached['personer'],
-                                         lambda p: str(p.get('avdelning_id')) == str(avd['_id']))
-
-                # Visa om det finns ombud eller medlemmar
-                if reps > 0 or avd.get('beraknat_medlemsantal', 0) > 0:
-                    with st.expander(f"{avd['namn']} ({avd['forvaltning_namn']})"):
-                        members = avd.get('beraknat_medlemsantal', 0)
-
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Antal medlemmar", members)
-                        with col2:
-                            st.metric("Antal Skyddsombud", reps)
-
-                        if members > 0:
-                            st.metric("Medlemmar per Skyddsombud",
-                                      round(members / reps if reps > 0 else float('inf'), 1))
-
-            # Statistik per enhet
-            st.markdown("### Per Enhet")
-            for enhet in cached['enheter']:
-                # Räkna ombud för denna enhet
-                reps = count_safety_reps(cached['personer'],
-                                         lambda p: str(p.get('enhet_id')) == str(enhet['_id']))
-
-                # Visa om det finns ombud eller medlemmar
-                if reps > 0 or enhet.get('beraknat_medlemsantal', 0) > 0:
-                    with st.expander(f"{enhet['namn']} ({enhet['avdelning_namn']}, {enhet['forvaltning_namn']})"):
-                        members = enhet.get('beraknat_medlemsantal', 0)
-
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Antal medlemmar", members)
-                        with col2:
-                            st.metric("Antal Skyddsombud", reps)
-
-                        if members > 0:
-                            st.metric("Medlemmar per Skyddsombud",
-                                      round(members / reps if reps > 0 else float('inf'), 1))
+        total_members = stats['members_total']
+
+        stats_tabs = st.tabs(["Visionombud", "Skyddsombud"])
+
+        for stats_tab, typ, rep_label in zip(stats_tabs, ('vision', 'safety'), ('Visionombud', 'Skyddsombud')):
+            with stats_tab:
+                rep_counts = stats[typ]
+
+                # Översikt av totala antal
+                st.markdown("### Total Översikt")
+                total_reps = rep_counts['total']
+
+                # Visa totala mätvärden
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("Totalt antal medlemmar", total_members)
+                with col2:
+                    st.metric(f"Totalt antal {rep_label}", total_reps)
+
+                if total_members > 0:
+                    st.metric(f"Medlemmar per {rep_label}", ratio_str(total_members, total_reps))
+
+                # Statistik per nivå, avdelningar och enheter visas bara på begäran
+                for level_title, collection_name, level, label_func in STATS_LEVELS:
+                    st.markdown(f"### Per {level_title}")
+                    if level != 'forv' and not st.checkbox(f"Visa per {level_title.lower()}",
+                                                           key=f"{typ}_per_{level}"):
+                        continue
+
+                    st.dataframe(
+                        _unit_table(cached[collection_name], rep_counts[level], rep_label, label_func),
+                        hide_index=True,
+                        use_container_width=True,
+                        column_config={
+                            f'Medlemmar per {rep_label}': st.column_config.NumberColumn(format="%.1f")
+                        }
+                    )
 
     with tab4:
         st.subheader("Geografisk Översikt")
@@ -855,19 +978,18 @@ def show(db):
         arbetsplatser = cached['arbetsplatser']
         personer = cached['personer']
 
-        # Visa statistik om arbetsplatser på kartan
-        with col2:
-            total_arbetsplatser = len(arbetsplatser)
-            arbetsplatser_med_koordinater = len([ap for ap in arbetsplatser if ap.get('coordinates')])
-            st.info(f"Visar {arbetsplatser_med_koordinater} av {total_arbetsplatser} arbetsplatser på kartan")
+        # Arbetsplatser utan koordinater finns redan i cachens index, så
+        # antalet med koordinater behöver ingen egen genomgång av listan
+        saknar_koordinater = indexes['arbetsplatser_utan_koordinater']
+        total_arbetsplatser = len(arbetsplatser)
+        arbetsplatser_med_koordinater = total_arbetsplatser - len(saknar_koordinater)
 
-        # Visa kartan med arbetsplatser och ombud
-        karta, failed_locations = load_map(arbetsplatser, personer, db)
-        folium_static(karta)
+        # Visa statistik om arbetsplatser på kartan
+        st.info(f"Visar {arbetsplatser_med_koordinater} av {total_arbetsplatser} arbetsplatser på kartan")
 
-        # Visa eventuella platser som saknar koordinater
+        # Visa platser som saknar koordinater före kartan, så att de syns
+        # medan kartan laddas
         st.markdown("### Arbetsplatser som saknar koordinater")
-        saknar_koordinater = [ap['namn'] for ap in arbetsplatser if not ap.get('coordinates')]
 
         if saknar_koordinater:
             col1, col2 = st.columns([1, 4])
@@ -880,20 +1002,43 @@ def show(db):
                             st.success(f"✅ Genererade koordinater för {updated} arbetsplatser!")
                             if failed > 0:
                                 st.warning(f"⚠️ Kunde inte generera koordinater för {failed} arbetsplatser")
-                            # Uppdatera cachen och ladda om sidan
+                            # Uppdatera cachen och ladda om sidan. Cachen får en ny
+                            # version, så kartan byggs om av sig själv vid omladdningen.
                             update_cache_after_change(db, 'arbetsplatser', 'update')
-                            # Rensa cache för kartan
-                            load_map.clear()
                             st.rerun()
                         else:
                             st.error("❌ Kunde inte generera några koordinater")
 
             with col2:
-                for plats in saknar_koordinater:
-                    st.warning(f"⚠️ {plats}")
+                # Alla platser i ett enda element istället för en varning per plats
+                st.warning("⚠️ Saknar koordinater:\n\n" + "\n".join(f"- {plats}" for plats in saknar_koordinater))
         else:
             st.success("✅ Alla arbetsplatser har koordinater")
 
+        # Visa kartan med arbetsplatser och ombud. Den renderade kartan sparas i
+        # sessionen och byggs bara om när arbetsplatserna eller personerna
+        # ändrats, eller när användaren ber om det.
+        data_version = get_cache_version('arbetsplatser', 'personer')
+        if st.button("🔄 Ladda om kartan"):
+            load_map.clear()
+            st.session_state.pop('map_version', None)
+
+        if st.session_state.get('map_version') != data_version:
+            karta_html, failed, kommun_fel = load_map(arbetsplatser, personer, db, data_version)
+            st.session_state.map_html = karta_html
+            st.session_state.map_failed = failed
+            if kommun_fel:
+                # Kartan utan kommungränser får inte ligga kvar i cachen, nästa
+                # omkörning försöker läsa in kommundatan igen
+                st.error(f"Fel vid hantering av kommundata: {kommun_fel}")
+                load_map.clear()
+                st.session_state.pop('map_version', None)
+            else:
+                st.session_state.map_version = data_version
+
+        components.html(st.session_state.map_html, height=600)
+        failed_locations = st.session_state.map_failed
+
         # Visa eventuella fel vid kartgenerering
         if failed_locations:
             st.markdown("### Problem vid kartgenerering")